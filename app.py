@@ -1,8 +1,14 @@
 import re, unicodedata, logging
+from functools import lru_cache
+from itertools import zip_longest
 import pandas as pd
 import pdfplumber
 import streamlit as st
+try: import pyarrow  # ships with streamlit; pins Arrow-backed strings for the validators
+except ImportError: pyarrow = None
 from io import BytesIO
+from dataclasses import dataclass
+from typing import Callable
 
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
@@ -10,40 +16,142 @@ logging.getLogger("pdfminer").setLevel(logging.ERROR)
 ARABIC_RE = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]+")
 ZERO_WIDTH_RE = re.compile(r"[\u200B-\u200D\u2060\uFEFF]")
 ILLEGAL_XLSX_RE = re.compile(r"[\x00-\x08\x0B-\x0C\x0E-\x1F]")
+# single-pass cleaner: drops Arabic/zero-width/illegal chars and collapses whitespace
+# (a whitespace run swallows neighbouring dropped chars, so "a \u200b b" -> "a b")
+_DROP = r"\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF\u200B-\u200D\u2060\x00-\x08\x0B-\x0C\x0E-\x1F"
+CLEAN_RE = re.compile(rf"([{_DROP}\s]*[^\S\x0B\x0C\x1C-\x1F][{_DROP}\s]*)|[{_DROP}]+")
 META_PAT = (
-    r"(?:^|\b)(Establishment Name|Establishment Number|Address|Category|"
+    r"(?:^|\b)(?:Establishment Name|Establishment Number|Address|Category|"
     r"Scan QR|Printing Date|Total\s*:|QR\b|"
     r"المجموع|اسم المنشأة|رقم المنشأة|العنوان|الفئة|"
     r"امسح رمز الاستجابة السريعة|تاريخ الطباعة|إجمالي)(?:\b|:)"
 )
+META_RE = re.compile(META_PAT, re.IGNORECASE)
+# Non-Emirati "Person Name" cells carry a trailing 8+ digit person number
+NAME_TAIL_RE = re.compile(r"^(?P<name>.*?)(?P<number>\d{8,})\s*$")
+DIGIT_RUN_RE = re.compile(r"(\d{5,})")
+
+@lru_cache(maxsize=8192)  # headers repeat on every page; "", "Male", "Female" etc. repeat per row
+def _clean_cell_str(s: str) -> str:
+    # ASCII fast path (digits, dates, English names): NFKC is a no-op and there is
+    # nothing to drop, so split/join collapses whitespace + strips in one C call
+    if s.isascii() and ILLEGAL_XLSX_RE.search(s) is None: return " ".join(s.split())
+    s = unicodedata.normalize("NFKC", s)
+    # strip Arabic content from cells (per your requirement) + zero-width/illegal chars, collapse spaces
+    return CLEAN_RE.sub(lambda m: " " if m.group(1) else "", s).strip()
 
 def clean_cell(val):
     if val is None or (isinstance(val, float) and pd.isna(val)): return val
-    s = str(val)
-    s = unicodedata.normalize("NFKC", s)
-    s = ZERO_WIDTH_RE.sub("", s)
-    s = ARABIC_RE.sub("", s)          # strip Arabic content from cells (per your requirement)
-    s = ILLEGAL_XLSX_RE.sub("", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return _clean_cell_str(str(val))
+
+def clean_series(s):
+    # column-wise clean_cell: same steps, run through pandas' vectorized string kernels
+    return (
+        s.astype("string").str.normalize("NFKC")
+        .str.replace(ZERO_WIDTH_RE, "", regex=True)
+        .str.replace(ARABIC_RE, "", regex=True)
+        .str.replace(ILLEGAL_XLSX_RE, "", regex=True)
+        .str.replace(r"\s+", " ", regex=True).str.strip()
+    )
 
 def normalize_row(row): return [clean_cell(c) for c in row]
 
-def extract_rows(file_like):
-    rows_all = []
-    with pdfplumber.open(file_like) as pdf:
-        for page in pdf.pages:
-            for t in (page.extract_tables() or []):
-                t_norm = [normalize_row(r) for r in t if r and any(str(c or "").strip() for c in r)]
-                rows_all.extend(t_norm)
-    return rows_all
-
-def drop_meta_headers(df, is_header_row_fn):
-    def is_meta_row(row):
-        joined = " | ".join(str(x) for x in row if pd.notna(x))
-        return bool(re.search(META_PAT, joined, flags=re.IGNORECASE))
-    df = df[~df.apply(lambda r: is_meta_row(list(r.values)), axis=1)]
-    df = df[df.apply(lambda r: not is_header_row_fn(list(r.values)), axis=1)]
+# Arrow-backed str.fullmatch runs in C; the python-backed "string" dtype (pandas < 3's
+# default) loops per cell, ~5x slower on 200k Person Codes
+ARROW_STR = "string[pyarrow]" if pyarrow is not None else "string"
+
+def digits_mask(s, min_len=1):
+    # True where the (already stripped) cell is all ASCII-range digits, at least min_len long
+    return s.astype(ARROW_STR).str.fullmatch(rf"\d{{{min_len},}}", na=False)
+
+# pdfplumber's ruled-table detection, spelled out (MOHRE lists are fully ruled);
+# pages are opened with laparams=None so pdfminer skips layout analysis
+TABLE_SETTINGS = {"vertical_strategy": "lines", "horizontal_strategy": "lines"}
+
+def iter_page_rows(pages):
+    for page in pages:
+        for t in (page.extract_tables(table_settings=TABLE_SETTINGS) or []):
+            for r in t:
+                if r and any(str(c or "").strip() for c in r):
+                    yield normalize_row(r)
+        page.close()  # flush_cache + textmap cache
+
+def read_pdf_bytes(file_like):
+    return file_like.getvalue() if hasattr(file_like, "getvalue") else file_like.read()
+
+def iter_rows(file_like):
+    # Serial on purpose: pdfminer is pure Python, so threads only take turns on the
+    # GIL, and Streamlit scripts can't hand work to processes (see convert.py -j).
+    pdf_bytes = read_pdf_bytes(file_like)
+    with pdfplumber.open(BytesIO(pdf_bytes), laparams=None) as pdf:
+        yield from iter_page_rows(pdf.pages)
+
+def frame_from_rows(body, header):
+    # column-of-lists (SoA) build: zip_longest transposes in C and pads short rows
+    # with ""; extra trailing cells are trimmed to the header width
+    w = len(header)
+    cols = list(zip_longest(*body, fillvalue=""))[:w]
+    cols += [("",) * len(body)] * (w - len(cols))
+    # object dtype: with no body rows pandas would make float64 columns, which .str rejects
+    df = pd.DataFrame(dict(enumerate(cols)), dtype=object, copy=False)
+    df.columns = header  # positional keys above, so duplicate header names survive
+    return df
+
+def drop_meta_headers(df, header_keys):
+    # vectorized: one boolean mask per test instead of a Python callback per row
+    if df.empty: return df
+    cells = df.fillna("").astype(str)
+    joined = cells.iloc[:, 0].str.cat([cells.iloc[:, i] for i in range(1, cells.shape[1])], sep=" | ")
+    meta_mask = joined.str.contains(META_RE, na=False)
+    df, cells = df.loc[~meta_mask], cells.loc[~meta_mask]
+    if cells.shape[1] >= 2:
+        k0, k1 = header_keys
+        c0 = cells.iloc[:, 0].str.lower().str.replace(" ", "", regex=False)
+        c1 = cells.iloc[:, 1].str.lower().str.replace(" ", "", regex=False)
+        hdr_mask = c0.str.contains(k0, regex=False, na=False) & c1.str.contains(k1, regex=False, na=False)
+        df = df.loc[~hdr_mask]
+    return df
+
+def is_header_row(row, header_keys):
+    if not row or len(row) < 2: return False
+    r0 = (str(row[0] or "")).lower().replace(" ", "")
+    r1 = (str(row[1] or "")).lower().replace(" ", "")
+    return (header_keys[0] in r0) and (header_keys[1] in r1)
+
+@dataclass(frozen=True)
+class SchemaSpec:
+    """Everything that differs between the two MOHRE lists; to_clean() does the rest."""
+    name: str
+    expected: tuple
+    header_keys: tuple     # lowercased, space-free markers in cols 0/1
+    coerce_header: Callable
+    post: Callable         # schema-specific validations/normalizers on the cleaned frame
+
+    def is_header(self, row):
+        return is_header_row(row, self.header_keys)
+
+def to_clean(file_like, spec):
+    header, body = None, []
+    for r in iter_rows(file_like):
+        if spec.is_header(r):
+            if header is None: header = r
+            continue
+        if any(str(c or "").strip() for c in r): body.append(r)
+    if header is None and not body: raise ValueError("No tables found. If the PDF is scanned, please OCR first.")
+    header = spec.coerce_header(header or [])
+    df = frame_from_rows(body, header)
+
+    df = drop_meta_headers(df, spec.header_keys)
+
+    keep = [c for c in spec.expected if c in df.columns]
+    if keep: df = df[keep]
+
+    df = df.apply(clean_series)
+    df = spec.post(df)
+
+    # drop empties & tidy columns
+    df = df.loc[~df.fillna("").eq("").all(axis=1)]  # cells are pre-stripped; NA counts as blank
+    df.columns = [clean_cell(c) for c in df.columns]
     return df
 
 # ---------- Emirati cleaner (your original schema) ----------
@@ -53,11 +161,7 @@ EM_EXPECTED = [
 ]
 EM_EXPECTED_LC = {c.lower(): c for c in EM_EXPECTED}
 
-def em_is_header_row(row):
-    if not row or len(row) < 2: return False
-    r0 = (str(row[0] or "")).lower().replace(" ", "")
-    r1 = (str(row[1] or "")).lower().replace(" ", "")
-    return ("rowno" in r0) and ("personcode" in r1)
+EM_HEADER_KEYS = ("rowno", "personcode")
 
 def em_coerce_header(header):
     if not header: return EM_EXPECTED
@@ -81,77 +185,54 @@ def em_coerce_header(header):
         return EM_EXPECTED
     return out
 
-def to_clean_dataframe_emirati(file_like):
-    rows = extract_rows(file_like)
-    if not rows: raise ValueError("No tables found. If the PDF is scanned, please OCR first.")
-    header, body = None, []
-    for r in rows:
-        if em_is_header_row(r):
-            if header is None: header = r
-            continue
-        if any(str(c or "").strip() for c in r): body.append(r)
-    header = em_coerce_header(header or [])
-    body = [(r + [""]*max(0, len(header)-len(r)))[:len(header)] for r in body]
-    df = pd.DataFrame(body, columns=header)
-
-    df = drop_meta_headers(df, em_is_header_row)
-
-    keep = [c for c in EM_EXPECTED if c in df.columns]
-    if keep: df = df[keep]
-
-    try: df = df.map(clean_cell)
-    except AttributeError: df = df.applymap(clean_cell)
-
-    # validations
+def em_post(df):
+    # validations (cells are already stripped "string" data after clean_series)
     if "Row No" in df.columns:
-        df = df[df["Row No"].astype(str).str.strip().str.isdigit()]
+        df = df[digits_mask(df["Row No"])]
     if "Person Code" in df.columns:
-        pc = df["Person Code"].astype(str).str.strip()
-        df = df[pc.str.isdigit() & (pc.str.len() >= 10)]
+        df = df[digits_mask(df["Person Code"], 10)]
     if "Sex" in df.columns:
-        df["Sex"] = df["Sex"].astype(str).str.strip().str.title()
+        df["Sex"] = df["Sex"].astype("string").str.title()
         df = df[df["Sex"].isin(["Male","Female"])]
 
-    # drop empties & tidy columns
-    df.dropna(how="all", inplace=True)
-    df = df[~(df.astype(str).apply(lambda s: s.str.strip()).eq("").all(axis=1))]
-    df.columns = [clean_cell(c) for c in df.columns]
-
-    # types
+    # types (Row No is validated non-blank above, so typing before the blank-row drop is safe)
     if "Row No" in df.columns:
         df["Row No"] = (df["Row No"].astype(str).str.strip().replace("", pd.NA).astype("Int64"))
     if "Person Code" in df.columns:
         df["Person Code"] = df["Person Code"].astype(str).str.strip()
     if "Total Salary" in df.columns:
-        df["Total Salary"] = (
-            df["Total Salary"].astype(str).str.replace(",", "", regex=False).str.strip()
-            .replace("", pd.NA).astype(float)
-        )
+        # cells are already stripped; to_numeric maps "" to NaN (non-numbers too, instead of raising)
+        df["Total Salary"] = pd.to_numeric(
+            df["Total Salary"].astype("string").str.replace(",", "", regex=False), errors="coerce"
+        ).astype(float)
     # for col in ["Card Issue Date","Card Expiry Date"]:
     #     if col in df.columns:
     #         df[col] = pd.to_datetime(df[col], errors="coerce", dayfirst=True)
     return df
 
+EMIRATI_SPEC = SchemaSpec("emirati", tuple(EM_EXPECTED), EM_HEADER_KEYS, em_coerce_header, em_post)
+
+# public entry point for import use; the UI goes through _pipeline
+def to_clean_dataframe_emirati(file_like):
+    return to_clean(file_like, EMIRATI_SPEC)
+
 # ---------- Non-Emirati cleaner (new schema) ----------
 NE_EXPECTED = [
     "Passport Number","Person Name","Card Type",
     "Job Name","Nationality","Card Number","Contract Type",
 ]
 NE_EXPECTED_LC = {c.lower(): c for c in NE_EXPECTED}
+# "English / عربي" and "English\nعربي" header tails
+_BILINGUAL_SLASH_RE = re.compile(r"\s*/\s*[\u0600-\u06FF].*$", re.DOTALL)
+_BILINGUAL_NL_RE = re.compile(r"\n+[\u0600-\u06FF].*$", re.DOTALL)
 
-def ne_is_header_row(row):
-    if not row or len(row) < 2: return False
-    r0 = (str(row[0] or "")).lower().replace(" ", "")
-    r1 = (str(row[1] or "")).lower().replace(" ", "")
-    return ("passport" in r0) and ("personname" in r1)
+NE_HEADER_KEYS = ("passport", "personname")
 
 def ne_coerce_header(header):
     if not header: return NE_EXPECTED
     def k(x): return (x or "").lower().strip().replace("  ", " ")
     def strip_bilingual_noise(s):
-        s = re.sub(r"\s*/\s*[\u0600-\u06FF].*$", "", s, flags=re.DOTALL)
-        s = re.sub(r"\n+[\u0600-\u06FF].*$", "", s, flags=re.DOTALL)
-        return s.strip()
+        return _BILINGUAL_NL_RE.sub("", _BILINGUAL_SLASH_RE.sub("", s)).strip()
     aliases = {
         "passport number":"Passport Number","passport no":"Passport Number",
         "رقم جواز السفر":"Passport Number","رقمجوازالسفر":"Passport Number",
@@ -172,31 +253,11 @@ def ne_coerce_header(header):
         return NE_EXPECTED
     return out
 
-def to_clean_dataframe_non_emirati(file_like):
-    rows = extract_rows(file_like)
-    if not rows: raise ValueError("No tables found. If the PDF is scanned, please OCR first.")
-    header, body = None, []
-    for r in rows:
-        if ne_is_header_row(r):
-            if header is None: header = r
-            continue
-        if any(str(c or "").strip() for c in r): body.append(r)
-    header = ne_coerce_header(header or [])
-    body = [(r + [""]*max(0, len(header)-len(r)))[:len(header)] for r in body]
-    df = pd.DataFrame(body, columns=header)
-
-    df = drop_meta_headers(df, ne_is_header_row)
-
-    keep = [c for c in NE_EXPECTED if c in df.columns]
-    if keep: df = df[keep]
-
-    try: df = df.map(clean_cell)
-    except AttributeError: df = df.applymap(clean_cell)
-
+def ne_post(df):
     # --- NEW: split trailing ID from Person Name into Person Number ---
     if "Person Name" in df.columns:
         # capture: name (non-greedy) + trailing 8+ digits (if present) at the end of the cell
-        split = df["Person Name"].str.extract(r'^(?P<name>.*?)(?P<number>\d{8,})\s*$', expand=True)
+        split = df["Person Name"].str.extract(NAME_TAIL_RE, expand=True)
         # Person Number (text), Person Name cleaned
         df["Person Number"] = split["number"].fillna("")
         df["Person Name"] = split["name"].fillna(df["Person Name"]).str.strip()
@@ -212,28 +273,47 @@ def to_clean_dataframe_non_emirati(file_like):
 
     # validations/normalizers
     if "Passport Number" in df.columns:
-        df["Passport Number"] = df["Passport Number"].astype(str).str.strip()
-        df = df[df["Passport Number"] != ""]
+        pn = df["Passport Number"].astype("string")
+        df = df[pn.ne("").fillna(True)]  # only explicit blanks are dropped
     if "Contract Type" in df.columns:
-        df["Contract Type"] = df["Contract Type"].astype(str).str.strip().str.title()
+        df["Contract Type"] = ct = df["Contract Type"].astype("string").str.title()
         common = {"Limited","Unlimited"}
-        df = df[(df["Contract Type"] == "") | (df["Contract Type"].isin(common))]
+        df = df[(ct.eq("") | ct.isin(common)).fillna(False)]
     if "Card Number" in df.columns:
         df["Card Number"] = (
-            df["Card Number"].astype(str).str.strip()
-            .str.extract(r"(\d{5,})", expand=False).fillna("")  # keep first 5+ digit run
+            df["Card Number"].astype("string")
+            .str.extract(DIGIT_RUN_RE, expand=False).fillna("")  # keep first 5+ digit run
         )
+    return df
 
-    df.dropna(how="all", inplace=True)
-    df = df[~(df.astype(str).apply(lambda s: s.str.strip()).eq("").all(axis=1))]
-    df.columns = [clean_cell(c) for c in df.columns]
+NON_EMIRATI_SPEC = SchemaSpec("non_emirati", tuple(NE_EXPECTED), NE_HEADER_KEYS, ne_coerce_header, ne_post)
 
-    for col in ["Passport Number","Card Number"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip()
-    return df
+# public entry point for import use; the UI goes through _pipeline
+def to_clean_dataframe_non_emirati(file_like):
+    return to_clean(file_like, NON_EMIRATI_SPEC)
 
 # ---------- UI ----------
+# xlsxwriter serializes faster than openpyxl; skip URL auto-detection on every string cell.
+# (Not constant_memory: to_excel writes column-by-column and that mode keeps only the current row.)
+XLSX_OPTS = {"options": {"strings_to_urls": False}}
+
+SPECS = {spec.name: spec for spec in (EMIRATI_SPEC, NON_EMIRATI_SPEC)}
+
+# Streamlit re-runs the script on every interaction; memoize the whole pipeline per (file, schema).
+# Keyed on the spec's name rather than the spec itself, so the cache key stays a plain string.
+@st.cache_data(show_spinner=False, max_entries=16)
+def _pipeline(pdf_bytes, spec_name):
+    return to_clean(BytesIO(pdf_bytes), SPECS[spec_name])
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _excel_bytes(pdf_bytes, spec_name, sheet_name):
+    # keyed like _pipeline (the uploaded bytes), not on the frame: Streamlit hashes
+    # frames of 50k+ rows from a sample, so two large lists could share a payload
+    bio = BytesIO()
+    with pd.ExcelWriter(bio, engine="xlsxwriter", engine_kwargs=XLSX_OPTS) as w:
+        _pipeline(pdf_bytes, spec_name).to_excel(w, index=False, sheet_name=sheet_name)
+    return bio.getvalue()
+
 st.set_page_config(page_title="MOHRE Employee Lists → Clean Excel", page_icon="📄")
 st.title("MOHRE Employee Lists → Clean Excel")
 st.caption("Upload a MOHRE PDF. The app removes Arabic text, QR codes, photos, and tidies the table into Excel format.")
@@ -246,16 +326,13 @@ with tabs[0]:
     if up_em:
         with st.spinner("Cleaning Emirati list…"):
             try:
-                df_em = to_clean_dataframe_emirati(up_em)
+                pdf_em = up_em.getvalue()
+                df_em = _pipeline(pdf_em, EMIRATI_SPEC.name)
                 st.success(f"Done. Rows: {len(df_em)}")
                 st.dataframe(df_em.head(50), use_container_width=True)
-                bio = BytesIO()
-                with pd.ExcelWriter(bio, engine="openpyxl") as w:
-                    df_em.to_excel(w, index=False, sheet_name="Employee_List")
-                bio.seek(0)
                 st.download_button(
                     "⬇️ Download Emirati Clean Excel",
-                    data=bio.getvalue(),
+                    data=_excel_bytes(pdf_em, EMIRATI_SPEC.name, "Employee_List"),
                     file_name="Local_Employee_List_Cleaned.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 )
@@ -268,16 +345,13 @@ with tabs[1]:
     if up_ne:
         with st.spinner("Cleaning Non-Emirati list…"):
             try:
-                df_ne = to_clean_dataframe_non_emirati(up_ne)
+                pdf_ne = up_ne.getvalue()
+                df_ne = _pipeline(pdf_ne, NON_EMIRATI_SPEC.name)
                 st.success(f"Done. Rows: {len(df_ne)}")
                 st.dataframe(df_ne.head(50), use_container_width=True)
-                bio = BytesIO()
-                with pd.ExcelWriter(bio, engine="openpyxl") as w:
-                    df_ne.to_excel(w, index=False, sheet_name="Employees_List")
-                bio.seek(0)
                 st.download_button(
                     "⬇️ Download Non-Emirati Clean Excel",
-                    data=bio.getvalue(),
+                    data=_excel_bytes(pdf_ne, NON_EMIRATI_SPEC.name, "Employees_List"),
                     file_name="Employees_List_Cleaned.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 )
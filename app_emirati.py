@@ -1,7 +1,11 @@
 import re, unicodedata, logging
+from itertools import zip_longest
+from functools import lru_cache
 import pandas as pd
 import pdfplumber
 import streamlit as st
+try: import pyarrow  # ships with streamlit
+except ImportError: pyarrow = None
 from io import BytesIO
 
 # Silence pdfminer noise
@@ -11,6 +15,9 @@ logging.getLogger("pdfminer").setLevel(logging.ERROR)
 ARABIC_RE = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]+")
 ZERO_WIDTH_RE = re.compile(r"[\u200B-\u200D\u2060\uFEFF]")
 ILLEGAL_XLSX_RE = re.compile(r"[\x00-\x08\x0B-\x0C\x0E-\x1F]")
+# All three char classes above + whitespace in one pass (whitespace runs -> " ")
+_DROP = r"\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF\u200B-\u200D\u2060\x00-\x08\x0B-\x0C\x0E-\x1F"
+CLEAN_RE = re.compile(rf"([{_DROP}\s]*[^\S\x0B\x0C\x1C-\x1F][{_DROP}\s]*)|[{_DROP}]+")
 
 EXPECTED_COLS = [
     "Row No", "Person Code", "Person Name", "Card Number",
@@ -19,23 +26,42 @@ EXPECTED_COLS = [
 EXPECTED_COLS_LC_MAP = {c.lower(): c for c in EXPECTED_COLS}
 
 META_PAT = (
-    r"(?:^|\b)(Establishment Name|Establishment Number|Address|Category|"
+    r"(?:^|\b)(?:Establishment Name|Establishment Number|Address|Category|"
     r"Scan QR|Printing Date|Total\s*:|المجموع|QR\b)(?:\b|:)"
 )
+META_RE = re.compile(META_PAT, re.IGNORECASE)
+
+@lru_cache(maxsize=8192)
+def _clean_cell_str(s: str) -> str:
+    # ASCII without control chars: only whitespace collapsing is needed
+    if s.isascii() and ILLEGAL_XLSX_RE.search(s) is None:
+        return " ".join(s.split())
+    s = unicodedata.normalize("NFKC", s)
+    return CLEAN_RE.sub(lambda m: " " if m.group(1) else "", s).strip()
 
 def clean_cell(val):
     if val is None or (isinstance(val, float) and pd.isna(val)):
         return val
-    s = str(val)
-    s = unicodedata.normalize("NFKC", s)
-    s = ZERO_WIDTH_RE.sub("", s)
-    s = ARABIC_RE.sub("", s)
-    s = ILLEGAL_XLSX_RE.sub("", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return _clean_cell_str(str(val))
+
+def clean_series(s):
+    # Vectorized clean_cell for a whole column
+    return (
+        s.astype("string").str.normalize("NFKC")
+        .str.replace(ZERO_WIDTH_RE, "", regex=True)
+        .str.replace(ARABIC_RE, "", regex=True)
+        .str.replace(ILLEGAL_XLSX_RE, "", regex=True)
+        .str.replace(r"\s+", " ", regex=True).str.strip()
+    )
 
 def normalize_row(row): return [clean_cell(c) for c in row]
 
+# Arrow-backed strings keep str.fullmatch in C (python-backed "string" loops per cell)
+ARROW_STR = "string[pyarrow]" if pyarrow is not None else "string"
+
+def digits_mask(s, min_len=1):
+    return s.astype(ARROW_STR).str.fullmatch(rf"\d{{{min_len},}}", na=False)
+
 def is_header_row(row):
     if not row or len(row) < 2: return False
     r0 = (str(row[0] or "")).lower().replace(" ", "")
@@ -61,58 +87,66 @@ def coerce_header(header):
         return EXPECTED_COLS
     return out
 
-def extract_rows(file_like):
-    rows_all=[]
+def iter_rows(file_like):
     with pdfplumber.open(file_like) as pdf:
         for page in pdf.pages:
             tables = page.extract_tables() or []
             for t in tables:
-                t_norm=[normalize_row(r) for r in t if r and any(str(c or "").strip() for c in r)]
-                rows_all.extend(t_norm)
-    return rows_all
+                for r in t:
+                    if r and any(str(c or "").strip() for c in r):
+                        yield normalize_row(r)
+            page.close()  # release this page's char/textmap caches
+
+def frame_from_rows(body, header):
+    # column-of-lists (SoA) build: zip_longest transposes in C and pads short rows
+    # with ""; extra trailing cells are trimmed to the header width
+    w = len(header)
+    cols = list(zip_longest(*body, fillvalue=""))[:w]
+    cols += [("",) * len(body)] * (w - len(cols))
+    # object dtype: with no body rows pandas would make float64 columns, which .str rejects
+    df = pd.DataFrame(dict(enumerate(cols)), dtype=object, copy=False)
+    df.columns = header  # positional keys above, so duplicate header names survive
+    return df
 
 def to_clean_dataframe(file_like):
-    rows = extract_rows(file_like)
-    if not rows:
-        raise ValueError("No tables found. If the PDF is scanned, please OCR first.")
     header, body = None, []
-    for r in rows:
+    for r in iter_rows(file_like):
         if is_header_row(r):
             if header is None: header = r
             continue
         if any(str(c or "").strip() for c in r): body.append(r)
+    if header is None and not body:
+        raise ValueError("No tables found. If the PDF is scanned, please OCR first.")
     header = coerce_header(header or [])
-    body = [ (r + [""]*max(0,len(header)-len(r)))[:len(header)] for r in body ]
-    df = pd.DataFrame(body, columns=header)
+    df = frame_from_rows(body, header)
 
-    # Drop meta rows
-    def is_meta_row(row):
-        joined = " | ".join(str(x) for x in row if pd.notna(x))
-        return bool(re.search(META_PAT, joined, flags=re.IGNORECASE))
-    df = df[~df.apply(lambda r: is_meta_row(list(r.values)), axis=1)]
+    # Drop meta rows (join each row's cells column-wise, one regex pass over the result)
+    cells = df.fillna("").astype(str)
+    joined = cells.iloc[:, 0].str.cat([cells.iloc[:, i] for i in range(1, cells.shape[1])], sep=" | ")
+    df = df.loc[~joined.str.contains(META_RE, na=False)]
 
     # Column order & basic validity
     keep = [c for c in EXPECTED_COLS if c in df.columns]
     if keep: df = df[keep]
 
-    # Drop header-like body rows
-    df = df[df.apply(lambda r: not is_header_row(list(r.values)), axis=1)]
+    # Drop header-like body rows (is_header_row on cols 0/1, vectorized)
+    if df.shape[1] >= 2:
+        c0 = df.iloc[:, 0].astype("string").fillna("").str.lower().str.replace(" ", "", regex=False)
+        c1 = df.iloc[:, 1].astype("string").fillna("").str.lower().str.replace(" ", "", regex=False)
+        df = df.loc[~(c0.str.contains("rowno", regex=False) & c1.str.contains("personcode", regex=False))]
 
-    # Clean all cells
-    try: df = df.map(clean_cell)
-    except AttributeError: df = df.applymap(clean_cell)
+    # Clean all cells (column-wise)
+    df = df.apply(clean_series)
 
     # Light validations
-    if "Row No" in df.columns: df = df[df["Row No"].astype(str).str.strip().str.isdigit()]
-    if "Person Code" in df.columns:
-        df = df[df["Person Code"].astype(str).str.strip().str.isdigit() & (df["Person Code"].astype(str).str.len()>=10)]
+    if "Row No" in df.columns: df = df[digits_mask(df["Row No"])]
+    if "Person Code" in df.columns: df = df[digits_mask(df["Person Code"], 10)]
     if "Sex" in df.columns:
-        df["Sex"] = df["Sex"].astype(str).str.strip().str.title()
+        df["Sex"] = df["Sex"].astype("string").str.title()
         df = df[df["Sex"].isin(["Male","Female"])]
 
     # Drop empty rows, sanitize columns
-    df.dropna(how="all", inplace=True)
-    df = df[~(df.astype(str).apply(lambda s: s.str.strip()).eq("").all(axis=1))]
+    df = df.loc[~df.fillna("").eq("").all(axis=1)]  # cells are pre-stripped; NA counts as blank
     df.columns = [clean_cell(c) for c in df.columns]
 
     # --- Type conversions ---
@@ -131,15 +165,17 @@ def to_clean_dataframe(file_like):
 
     # Convert Total Salary → float
     if "Total Salary" in df.columns:
-        df["Total Salary"] = (
-            df["Total Salary"]
-            .astype(str).str.replace(",", "").str.strip()
-            .replace("", pd.NA)
-            .astype(float)
-        )
+        df["Total Salary"] = pd.to_numeric(
+            df["Total Salary"].astype("string").str.replace(",", "", regex=False),
+            errors="coerce",
+        ).astype(float)
 
     return df
 
+# xlsxwriter serializes faster than openpyxl; skip URL auto-detection on every string cell.
+# (Not constant_memory: to_excel writes column-by-column and that mode keeps only the current row.)
+XLSX_OPTS = {"options": {"strings_to_urls": False}}
+
 st.set_page_config(page_title="MOHRE PDF → Clean Excel", page_icon="📄")
 st.title("MOHRE Local Employee List → Clean Excel")
 st.caption("Upload the MOHRE PDF. This app removes Arabic text, page headers, and images/QRs, then outputs a tidy Excel file.")
@@ -155,7 +191,7 @@ if uploaded:
 
             # Prepare download
             bio = BytesIO()
-            with pd.ExcelWriter(bio, engine="openpyxl") as w:
+            with pd.ExcelWriter(bio, engine="xlsxwriter", engine_kwargs=XLSX_OPTS) as w:
                 df.to_excel(w, index=False, sheet_name="Employee_List")
             bio.seek(0)
             st.download_button(
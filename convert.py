@@ -14,13 +14,28 @@ Usage:
 
 import argparse
 import logging
+import os
 import re
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from itertools import repeat, zip_longest
 from pathlib import Path
 
 import pandas as pd
 import pdfplumber
 
+try:  # optional alternative table extractor (--backend pymupdf)
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:  # Arrow-backed strings for the digit validators (see digits_mask)
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 # Silence noisy font warnings from pdfminer/pdfplumber
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
@@ -31,6 +46,12 @@ ARABIC_RE = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\u
 ZERO_WIDTH_RE = re.compile(r"[\u200B-\u200D\u2060\uFEFF]")
 ILLEGAL_XLSX_RE = re.compile(r"[\x00-\x08\x0B-\x0C\x0E-\x1F]")  # Excel-forbidden control chars
 
+# Fused form of the three classes above plus whitespace collapsing, so clean_cell
+# walks each string once. Group 1 is a whitespace run (including any dropped chars
+# inside/around it) and becomes a single space; anything else matched is dropped.
+_DROP = r"\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF\u200B-\u200D\u2060\x00-\x08\x0B-\x0C\x0E-\x1F"
+CLEAN_RE = re.compile(rf"([{_DROP}\s]*[^\S\x0B\x0C\x1C-\x1F][{_DROP}\s]*)|[{_DROP}]+")
+
 EXPECTED_COLS = [
     "Row No",
     "Person Code",
@@ -45,8 +66,41 @@ EXPECTED_COLS = [
 
 EXPECTED_COLS_LC_MAP = {c.lower(): c for c in EXPECTED_COLS}
 
+# Excel output via xlsxwriter (faster than openpyxl); skip URL auto-detection on every
+# string cell. constant_memory is deliberately off: DataFrame.to_excel writes cells
+# column-by-column, and that mode only keeps the current row (earlier columns go blank).
+XLSX_OPTS = {"options": {"strings_to_urls": False}}
+
+# pdfplumber's ruled-table detection, spelled out (MOHRE lists are fully ruled).
+# PDFs are opened with laparams=None so pdfminer skips layout analysis.
+TABLE_SETTINGS = {"vertical_strategy": "lines", "horizontal_strategy": "lines"}
+
+# Below this page count, process start-up + re-parsing outweighs parallel extraction
+PARALLEL_MIN_PAGES = 20
+
+# MOHRE page metadata blocks that sometimes get extracted as table rows
+META_PAT = (
+    r"(?:^|\b)(?:Establishment Name|Establishment Number|Address|Category|"
+    r"Scan QR|Printing Date|Total\s*:|المجموع|QR\b)(?:\b|:)"
+)
+META_RE = re.compile(META_PAT, re.IGNORECASE)
+
 # --- Cleaners -----------------------------------------------------------------
 
+@lru_cache(maxsize=8192)
+def _clean_cell_str(s: str) -> str:
+    """
+    String path of clean_cell, memoized: header cells repeat on every page and
+    short values ("", "Male", "Female", ...) repeat on most rows.
+    """
+    # ASCII fast path (most cells: Row No, codes, dates, names): NFKC is a no-op and
+    # nothing but illegal control chars could need dropping, so when there are none
+    # a C-level split/join does the whitespace collapse + strip on its own.
+    if s.isascii() and ILLEGAL_XLSX_RE.search(s) is None:
+        return " ".join(s.split())
+    s = unicodedata.normalize("NFKC", s)
+    return CLEAN_RE.sub(lambda m: " " if m.group(1) else "", s).strip()
+
 def clean_cell(val):
     """
     Normalize Unicode; remove Arabic, zero-width, and Excel-illegal chars.
@@ -54,13 +108,34 @@ def clean_cell(val):
     """
     if val is None or (isinstance(val, float) and pd.isna(val)):
         return val
-    s = str(val)
-    s = unicodedata.normalize("NFKC", s)
-    s = ZERO_WIDTH_RE.sub("", s)
-    s = ARABIC_RE.sub("", s)
-    s = ILLEGAL_XLSX_RE.sub("", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return _clean_cell_str(str(val))
+
+def clean_series(s):
+    """
+    Vectorized clean_cell for a whole column: the same normalization and
+    regex passes, run through pandas' string methods instead of per cell.
+    Missing values stay missing (<NA>).
+    """
+    return (
+        s.astype("string")
+        .str.normalize("NFKC")
+        .str.replace(ZERO_WIDTH_RE, "", regex=True)
+        .str.replace(ARABIC_RE, "", regex=True)
+        .str.replace(ILLEGAL_XLSX_RE, "", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+# pandas < 3 defaults "string" to Python storage, where str.fullmatch loops per cell;
+# Arrow storage runs it in C (~5x faster on 200k Person Codes).
+ARROW_STR = "string[pyarrow]" if pyarrow is not None else "string"
+
+def digits_mask(s, min_len=1):
+    """
+    Boolean mask: cell is an ASCII-digit string of at least min_len chars.
+    Cells must already be stripped (clean_series); missing values are False.
+    """
+    return s.astype(ARROW_STR).str.fullmatch(rf"\d{{{min_len},}}", na=False)
 
 def normalize_row(row):
     """Apply clean_cell to every cell in a row list."""
@@ -127,19 +202,73 @@ def coerce_header(header):
 
 # --- Extraction ---------------------------------------------------------------
 
-def extract_tables(pdf_path: Path):
-    """Extract tables from each page using pdfplumber's table extraction."""
-    rows_all = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_idx, page in enumerate(pdf.pages, start=1):
-            tables = page.extract_tables()
-            if not tables:
-                continue
-            for t in tables:
+def iter_page_rows(pages):
+    """
+    Yield cleaned table rows from pdfplumber pages using its table extraction.
+    Each page's cached chars/objects are released before the next page is parsed.
+    """
+    for page in pages:
+        tables = page.extract_tables(table_settings=TABLE_SETTINGS)
+        for t in tables or []:
+            for r in t:
                 # Clean each row immediately
-                t_norm = [normalize_row(r) for r in t if r and any((c is not None and str(c).strip()) for c in r)]
-                rows_all.extend(t_norm)
-    return rows_all
+                if r and any((c is not None and str(c).strip()) for c in r):
+                    yield normalize_row(r)
+        page.close()  # flush_cache + textmap cache
+
+def _extract_page_range(pdf_bytes: bytes, lo: int, hi: int):
+    """Worker: open a private handle on the PDF bytes and extract pages [lo, hi)."""
+    with pdfplumber.open(BytesIO(pdf_bytes), pages=list(range(lo + 1, hi + 1)), laparams=None) as pdf:
+        return list(iter_page_rows(pdf.pages))
+
+def iter_rows_mupdf(pdf_bytes: bytes):
+    """
+    Yield cleaned table rows using PyMuPDF's page.find_tables().
+    Opt-in only: on the sample MOHRE list it was slower than pdfplumber and
+    missed the rightmost (Total Salary) column.
+    """
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            for tbl in page.find_tables():
+                for r in tbl.extract():
+                    if r and any((c is not None and str(c).strip()) for c in r):
+                        yield normalize_row(r)
+
+def iter_rows(pdf_path: Path, workers=None, backend="pdfplumber"):
+    """
+    Yield cleaned table rows from every page, in page order.
+
+    Table detection is CPU-bound and independent per page, so PDFs with at least
+    PARALLEL_MIN_PAGES pages are split into one contiguous page range per worker
+    process; smaller PDFs (or workers=1) are streamed serially.
+    With backend="pymupdf", PyMuPDF is tried first; its rows are only used if
+    their header maps onto every EXPECTED_COLS column, otherwise (no tables, or a
+    column missed, as with Total Salary on the sample list) pdfplumber re-reads the file.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    pdf_bytes = Path(pdf_path).read_bytes()
+    if backend == "pymupdf":
+        rows = list(iter_rows_mupdf(pdf_bytes))
+        header = next((r for r in rows if is_header_row(r)), None)
+        if header is not None and set(EXPECTED_COLS) <= set(coerce_header(header)):
+            yield from rows
+            return
+        if rows:
+            print("⚠️ PyMuPDF missed expected columns; falling back to pdfplumber.")
+
+    with pdfplumber.open(BytesIO(pdf_bytes), laparams=None) as pdf:
+        n_pages = len(pdf.pages)
+        if workers == 1 or n_pages < PARALLEL_MIN_PAGES:
+            yield from iter_page_rows(pdf.pages)
+            return
+
+    step = -(-n_pages // workers)  # ceil
+    bounds = [(lo, min(lo + step, n_pages)) for lo in range(0, n_pages, step)]
+    with ProcessPoolExecutor(max_workers=len(bounds)) as ex:
+        chunks = ex.map(_extract_page_range, repeat(pdf_bytes), *zip(*bounds))
+        for chunk in chunks:
+            yield from chunk
 
 def split_header_and_body(rows):
     """
@@ -158,95 +287,105 @@ def split_header_and_body(rows):
             body.append(row)
     return header, body
 
-def align_to_header(body, header_len):
-    """Ensure each body row has exactly header_len columns (pad or trim)."""
-    fixed = []
-    for r in body:
-        if len(r) < header_len:
-            r = r + [""] * (header_len - len(r))
-        elif len(r) > header_len:
-            r = r[:header_len]
-        fixed.append(r)
-    return fixed
+def frame_from_rows(body, header):
+    """
+    Build the DataFrame column-wise, aligning rows to the header width on the way:
+    zip_longest transposes the rows in C, padding short ones with "", and columns
+    beyond the header are dropped. No per-row pad/trim lists are allocated.
+    Columns are keyed by position first so duplicate header names survive, and
+    built as object dtype so a header-only PDF doesn't yield float64 columns.
+    """
+    width = len(header)
+    cols = list(zip_longest(*body, fillvalue=""))[:width]
+    cols += [("",) * len(body)] * (width - len(cols))
+    df = pd.DataFrame(dict(enumerate(cols)), dtype=object, copy=False)
+    df.columns = header
+    return df
 
 # --- Main ---------------------------------------------------------------------
 
+def positive_int(value):
+    """argparse type: an int >= 1."""
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be >= 1, got {value}")
+    return n
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("pdf", type=str, help="Path to the PDF file")
     ap.add_argument("-o", "--output", type=str, default=None, help="Output Excel path (.xlsx)")
+    ap.add_argument("-j", "--workers", type=positive_int, default=None,
+                    help="Worker processes for page extraction (default: CPU count; 1 = serial)")
+    ap.add_argument("--backend", choices=["pdfplumber", "pymupdf"], default="pdfplumber",
+                    help="Table extractor (pymupdf needs PyMuPDF; falls back to pdfplumber if it misses any expected column)")
     args = ap.parse_args()
 
     pdf_path = Path(args.pdf)
     if not pdf_path.exists():
         raise SystemExit(f"❌ File not found: {pdf_path}")
 
+    if args.backend == "pymupdf" and pymupdf is None:
+        raise SystemExit("❌ --backend pymupdf needs PyMuPDF (pip install pymupdf).")
+
     out_path = Path(args.output) if args.output else pdf_path.with_name(pdf_path.stem + "_Cleaned.xlsx")
 
-    # 1) Extract raw rows from all pages (images ignored)
-    rows = extract_tables(pdf_path)
-    if not rows:
+    # 1) Stream raw rows from all pages (images ignored) and
+    # 2) separate header from body, removing header repetition
+    raw_header, body = split_header_and_body(iter_rows(pdf_path, args.workers, args.backend))
+    if raw_header is None and not body:
         raise SystemExit("❌ No tables found. If this PDF is scanned, run OCR first (e.g., ocrmypdf).")
 
-    # 2) Separate header from body, remove header repetition
-    raw_header, body = split_header_and_body(rows)
-
     # 3) Build the final header (clean + map to expected)
     header = coerce_header(raw_header or [])
-    header_len = len(header)
-
-    # 4) Align body rows to header width
-    body = align_to_header(body, header_len)
 
-    # 5) Create DataFrame and final cleanups
-    df = pd.DataFrame(body, columns=header)
+    # 4) Create the DataFrame, aligning body rows to the header width, and
+    # 5) final cleanups
+    df = frame_from_rows(body, header)
 
     # Keep only the columns we care about, preserving order when present
     keep_cols = [c for c in EXPECTED_COLS if c in df.columns]
     if keep_cols:
         df = df[keep_cols]
 
-    # Drop any header-like rows that slipped into body (paranoia)
-    df = df[df.apply(lambda r: not is_header_row(list(r.values)), axis=1)]
+    # Drop any header-like rows that slipped into body (paranoia) — same test as
+    # is_header_row, run on the first two columns instead of row by row
+    if df.shape[1] >= 2:
+        c0 = df.iloc[:, 0].astype("string").fillna("").str.lower().str.replace(" ", "", regex=False)
+        c1 = df.iloc[:, 1].astype("string").fillna("").str.lower().str.replace(" ", "", regex=False)
+        hdr_mask = c0.str.contains("rowno", regex=False, na=False) & c1.str.contains("personcode", regex=False, na=False)
+        df = df.loc[~hdr_mask]
 
-    # Apply cleaner to every cell — pandas 2.2+: DataFrame.map; fallback to applymap
-    try:
-        df = df.map(clean_cell)
-    except AttributeError:
-        df = df.applymap(clean_cell)
+    # Apply cleaner column-wise (vectorized string ops)
+    df = df.apply(clean_series)
 
-    # Drop fully-empty rows after cleaning
-    df.dropna(how="all", inplace=True)
-    is_blank = df.astype(str).apply(lambda s: s.str.strip()).eq("").all(axis=1)
-    df = df[~is_blank]
+    # Drop fully-empty rows after cleaning: cells are already stripped, so a blank
+    # cell is exactly "" or <NA> (this also covers all-NA rows)
+    is_blank = df.fillna("").eq("").all(axis=1)
+    df = df.loc[~is_blank]
 
     # Final column sanitization
     df.columns = [clean_cell(c) for c in df.columns]
 
     # --- Drop MOHRE page metadata blocks that sometimes get extracted as rows ---
-    META_PAT = (
-        r"(?:^|\b)(Establishment Name|Establishment Number|Address|Category|"
-        r"Scan QR|Printing Date|Total\s*:|المجموع|QR\b)(?:\b|:)"
-    )
-
-    def is_meta_row(row) -> bool:
-        joined = " | ".join(str(x) for x in row if pd.notna(x))
-        return bool(re.search(META_PAT, joined, flags=re.IGNORECASE))
-
-    df = df[~df.apply(lambda r: is_meta_row(list(r.values)), axis=1)]
+    # Join each row's cells column-wise, then test the whole column in one pass
+    cells = df.fillna("").astype(str)
+    joined = cells.iloc[:, 0].str.cat([cells.iloc[:, i] for i in range(1, cells.shape[1])], sep=" | ")
+    meta_mask = joined.str.contains(META_RE, na=False)
+    df = df.loc[~meta_mask]
 
     # --- (Optional but helpful) sanity checks to keep only employee rows ---
-    # 1) Row No should be integer-like
-    def intlike(s): 
-        s = str(s).strip()
-        return s.isdigit()
-
+    # 1) Row No should be integer-like; typed as Int64 only when every value fits
+    #    (<= 18 digits), since to_numeric would wrap or round longer ones. Otherwise text.
     if "Row No" in df.columns:
-        df = df[df["Row No"].apply(intlike)]
+        df = df.loc[digits_mask(df["Row No"])]
+        if df["Row No"].str.len().le(18).all():
+            df["Row No"] = df["Row No"].astype("Int64")
 
-    # 2) Person Code is usually a long numeric string (>=10 digits)
+    # 2) Person Code is usually a long numeric string (>=10 digits); stays text,
+    #    since leading zeros matter and it may not fit in int64
     if "Person Code" in df.columns:
-        df = df[df["Person Code"].apply(lambda x: str(x).strip().isdigit() and len(str(x).strip()) >= 10)]
+        df = df.loc[digits_mask(df["Person Code"], 10)]
 
     # 3) Sex should be Male/Female if present
     if "Sex" in df.columns:
@@ -255,7 +394,7 @@ def main():
 
 
     # 6) Write Excel
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
+    with pd.ExcelWriter(out_path, engine="xlsxwriter", engine_kwargs=XLSX_OPTS) as writer:
         df.to_excel(writer, sheet_name="Employee_List", index=False)
 
     print(f"✅ Done: {out_path}")